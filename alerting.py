@@ -0,0 +1,255 @@
+import csv
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from operational_states import HOURS_PER_WEEK, classify_states, hourly_readings, load_site, shift_mask
+
+# File path to the CSV file in the Documents folder
+file_path = '/Users/armuaa/Documents/site-a.csv'  # Update to your correct path
+
+ALERT_FIELDS = ['timestamp', 'sensor', 'kind', 'value', 'deviation', 'expected', 'z_score']
+
+
+def compute_deviations(readings, lookback_weeks=4):
+    """
+    Compute hourly deviations from the rolling average for several sensors at once.
+
+    This is the same calculation as `analyze_seven_day_pattern`, done for all
+    sensors column-wise and without plotting.
+
+    Parameters:
+    readings (pd.DataFrame): Hourly readings as returned by `hourly_readings`.
+    lookback_weeks (int): Number of weeks in the rolling average window.
+
+    Returns:
+    pd.DataFrame: Hourly deviations shaped like `readings`.
+    """
+    rolling_avg = readings.rolling(window=HOURS_PER_WEEK * lookback_weeks, min_periods=1).mean()
+    return readings - rolling_avg
+
+
+class DeviationAlerter:
+    """
+    Keep running EWMA statistics of deviations per sensor and weekday-hour slot
+    and flag readings whose z-score is out of range.
+
+    Until a slot has seen about 1 / alpha observations its statistics are the
+    plain running mean and variance, so they are not biased towards the zero start.
+
+    State is held in (n_sensors, 168) arrays so each new hour is evaluated for
+    all sensors with a handful of vectorized operations.
+    """
+
+    def __init__(self, sensors, alpha=0.1, z_threshold=3.0, warmup=8, min_std=0.05,
+                 on_shift=None, base_load_levels=None, tolerance=0.5):
+        """
+        Parameters:
+        sensors (list): Sensor column names, in the order readings are passed.
+        alpha (float): EWMA smoothing factor.
+        z_threshold (float): z-score above which a reading is flagged. Off-hours and
+            base load alerts only fire on excess consumption; on-shift consumption
+            alerts fire in both directions.
+        warmup (int): Observations needed in a slot before it can raise alerts.
+        min_std (float): Lower bound on the standard deviation used for z-scores.
+        on_shift (np.ndarray): Boolean mask of length 168, see `shift_mask`.
+        base_load_levels (array-like): Optional base load level per sensor, e.g. the
+            percentile-based base load from `classify_states`; see `from_readings`.
+        tolerance (float): Tolerance above the base load level still counted as base load.
+        """
+        self.sensors = list(sensors)
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.min_std = min_std
+        self.on_shift = shift_mask() if on_shift is None else np.asarray(on_shift, dtype=bool)
+        self.base_load_levels = None
+        if base_load_levels is not None:
+            self.base_load_levels = np.asarray(base_load_levels, dtype=float) + tolerance
+
+        n_sensors = len(self.sensors)
+        self.mean = np.zeros((n_sensors, HOURS_PER_WEEK))
+        self.var = np.zeros((n_sensors, HOURS_PER_WEEK))
+        self.count = np.zeros((n_sensors, HOURS_PER_WEEK), dtype=np.int64)
+
+    @classmethod
+    def from_readings(cls, readings, fit_until=None, base_load_percentile=10, tolerance=0.5, **kwargs):
+        """
+        Create an alerter for the columns of `readings`, with the base load levels
+        taken from `classify_states`.
+
+        The levels are fitted on `readings` up to `fit_until` only. When replaying
+        history through `run_alerts`, set it to the end of a training window and
+        replay the hours after it, so no alert depends on later data.
+
+        Parameters:
+        readings (pd.DataFrame): Hourly readings, one column per sensor.
+        fit_until (str): Last timestamp used to fit the base load levels; None uses all of `readings`.
+        base_load_percentile (float): Percentile used for the base load level.
+        tolerance (float): Tolerance above the base load level still counted as base load.
+        **kwargs: Further arguments for `DeviationAlerter`.
+
+        Returns:
+        DeviationAlerter: The new alerter.
+        """
+        _, thresholds = classify_states(readings.loc[:fit_until], base_load_percentile, tolerance)
+        return cls(list(readings.columns), base_load_levels=thresholds['percentile_base_load'].to_numpy(),
+                   tolerance=tolerance, **kwargs)
+
+    def update(self, timestamp, deviations, readings=None):
+        """
+        Evaluate one hour of deviations for all sensors, then fold them into the state.
+
+        Parameters:
+        timestamp (pd.Timestamp): The hour the values belong to.
+        deviations (array-like): Deviation per sensor, NaN where data is missing.
+        readings (array-like): Optional actual values per sensor, used for the alert
+            kind and reported with the alert.
+
+        Returns:
+        list: Alerts as dicts with the keys in ALERT_FIELDS.
+        """
+        timestamp = pd.Timestamp(timestamp)
+        slot = timestamp.weekday() * 24 + timestamp.hour
+        x = np.asarray(deviations, dtype=float)
+        valid = ~np.isnan(x)
+
+        mean = self.mean[:, slot].copy()
+        var = self.var[:, slot].copy()
+        count = self.count[:, slot].copy()
+
+        # Scale the population variance to a sample variance over the effective window
+        effective = np.minimum(count, 1 / self.alpha)
+        scale = np.where(effective > 1, effective / np.maximum(effective - 1, 1), 1.0)
+        std = np.maximum(np.sqrt(var * scale), self.min_std)
+        z = (x - mean) / std
+
+        values = np.full(len(x), np.nan) if readings is None else np.asarray(readings, dtype=float)
+        kinds = self._classify(slot, values)
+        out_of_range = np.where(kinds == 'consumption', np.abs(z), z) > self.z_threshold
+        flagged = valid & (count >= self.warmup) & out_of_range
+
+        # Running mean and variance while a slot is new, EWMA afterwards; missing values are skipped
+        weight = np.maximum(self.alpha, 1 / (count + 1))
+        diff = np.where(valid, x - mean, 0.0)
+        increment = weight * diff
+        self.mean[:, slot] = mean + increment
+        self.var[:, slot] = np.where(valid, (1 - weight) * (var + diff * increment), var)
+        self.count[:, slot] = count + valid
+
+        if not flagged.any():
+            return []
+
+        alerts = []
+        for i in np.flatnonzero(flagged):
+            alerts.append({
+                'timestamp': timestamp.isoformat(),
+                'sensor': self.sensors[i],
+                'kind': kinds[i],
+                'value': float(values[i]),
+                'deviation': float(x[i]),
+                'expected': float(mean[i]),
+                'z_score': float(z[i]),
+            })
+        return alerts
+
+    def _classify(self, slot, values):
+        if not self.on_shift[slot]:
+            return np.full(len(values), 'off_hours', dtype=object)
+        if self.base_load_levels is None:
+            return np.full(len(values), 'consumption', dtype=object)
+        return np.where(values <= self.base_load_levels, 'base_load', 'consumption').astype(object)
+
+
+class CsvAlertSink:
+    """
+    Append alerts to a local CSV file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, alerts):
+        if not alerts:
+            return
+        new_file = not os.path.exists(self.path)
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=ALERT_FIELDS)
+            if new_file:
+                writer.writeheader()
+            writer.writerows(alerts)
+
+    def close(self):
+        pass
+
+
+class SQLiteAlertSink:
+    """
+    Store alerts in a local SQLite database, one transaction per batch.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS alerts ('
+            'timestamp TEXT, sensor TEXT, kind TEXT, value REAL, '
+            'deviation REAL, expected REAL, z_score REAL)'
+        )
+        self.connection.execute(
+            'CREATE INDEX IF NOT EXISTS idx_alerts_sensor_time ON alerts (sensor, timestamp)'
+        )
+        self.connection.commit()
+
+    def write(self, alerts):
+        if not alerts:
+            return
+        rows = [tuple(alert[field] for field in ALERT_FIELDS) for alert in alerts]
+        with self.connection:
+            self.connection.executemany('INSERT INTO alerts VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def close(self):
+        self.connection.close()
+
+
+def run_alerts(readings, deviations, alerter, sink):
+    """
+    Feed hourly deviations through the alerter in time order and write alerts to the sink.
+
+    Parameters:
+    readings (pd.DataFrame): Hourly actual values, one column per sensor.
+    deviations (pd.DataFrame): Hourly deviations with the same shape as `readings`.
+    alerter (DeviationAlerter): The alerter holding the running statistics.
+    sink (CsvAlertSink or SQLiteAlertSink): Where alerts are written.
+
+    Returns:
+    int: Number of alerts raised.
+    """
+    readings = readings[alerter.sensors].to_numpy(dtype=float)
+    values = deviations[alerter.sensors].to_numpy(dtype=float)
+
+    total = 0
+    for i, timestamp in enumerate(deviations.index):
+        alerts = alerter.update(timestamp, values[i], readings[i])
+        sink.write(alerts)
+        total += len(alerts)
+    return total
+
+
+if __name__ == '__main__':
+    df = load_site(file_path, date_format='%d/%m/%Y %H:%M')
+
+    # Example usage:
+    sensors = ['3210 - Fiberlaser (kWh)', '3211 - Laser (kWh)', '3222 - Laser (kWh)',
+               '3250 - Press (kWh)', '3252 - press (kWh)', 'Kompressor - S2PP (kWh)']
+    readings = hourly_readings(df, sensors, start_date='2022-12-20', end_date='2024-04-22')
+    deviations = compute_deviations(readings)
+
+    # Fit the base load levels on the first months, then replay the rest as a stream
+    training_end = '2023-03-31 23:00'
+    alerter = DeviationAlerter.from_readings(readings, fit_until=training_end)
+    replay = readings.index > pd.Timestamp(training_end)
+    sink = SQLiteAlertSink('alerts.sqlite')
+    print(f"Alerts raised: {run_alerts(readings[replay], deviations[replay], alerter, sink)}")
+    sink.close()
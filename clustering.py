@@ -0,0 +1,167 @@
+import numpy as np
+
+from operational_states import classify_states, hourly_readings, load_site
+
+# File path to the CSV file in the Documents folder
+file_path = '/Users/armuaa/Documents/site-a.csv'  # Update to your correct path
+
+BLOCK_BYTES = 64 * 1024 * 1024  # Memory budget for one block of pairwise AND results
+
+# Number of set bits in every byte value, used when np.bitwise_count is not available
+POPCOUNT_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def popcount(words):
+    """
+    Count set bits along the last axis of a uint64 array.
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    return POPCOUNT_TABLE[words.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+def pack_states(masks, states=('base_load', 'idle', 'production')):
+    """
+    Pack the state masks of every sensor into one bit array per sensor.
+
+    The masks of the chosen states are laid end to end, so two sensors share a bit
+    when they are in the same state in the same hour.
+
+    Parameters:
+    masks (dict): State masks as returned by `classify_states`.
+    states (tuple): The states to include.
+
+    Returns:
+    tuple: (sensors, packed, n_bits) where packed is a uint64 array with one row per sensor.
+    """
+    sensors = list(masks[states[0]].columns)
+    bits = np.concatenate([masks[state].to_numpy(dtype=bool).T for state in states], axis=1)
+    n_bits = bits.shape[1]
+
+    packed = np.packbits(bits, axis=1)
+    padding = -packed.shape[1] % 8
+    if padding:
+        packed = np.pad(packed, ((0, 0), (0, padding)))
+    return sensors, np.ascontiguousarray(packed).view(np.uint64), n_bits
+
+
+def _blocks(packed):
+    # Yield (start, intersection counts) for blocks of rows against all rows
+    n, n_words = packed.shape
+    rows = max(1, BLOCK_BYTES // max(n * n_words * 8, 1))
+    for start in range(0, n, rows):
+        block = packed[start:start + rows]
+        yield start, popcount(block[:, None, :] & packed[None, :, :])
+
+
+def _similarity(intersection, counts_a, counts_b, n_bits, metric):
+    if metric == 'jaccard':
+        union = counts_a[:, None] + counts_b[None, :] - intersection
+        # Sensors without any active hour share nothing, so an empty union scores 0
+        return np.where(union > 0, intersection / np.maximum(union, 1), 0.0)
+    if metric == 'hamming':
+        distance = counts_a[:, None] + counts_b[None, :] - 2 * intersection
+        return 1.0 - distance / n_bits
+    raise ValueError(f"Unknown metric {metric!r}, expected 'jaccard' or 'hamming'")
+
+
+def pairwise_similarity(packed, n_bits, metric='jaccard'):
+    """
+    Compute the full similarity matrix between all sensors.
+
+    Sensors without any active hour score 0 against every sensor, themselves
+    included, so they never look alike; `similar_pairs` skips them the same way.
+
+    Parameters:
+    packed (np.ndarray): Packed states as returned by `pack_states`.
+    n_bits (int): Number of valid bits per sensor.
+    metric (str): 'jaccard' or 'hamming' (1 minus the normalised Hamming distance).
+
+    Returns:
+    np.ndarray: float32 matrix of shape (n_sensors, n_sensors).
+    """
+    counts = popcount(packed)
+    similarity = np.empty((len(packed), len(packed)), dtype=np.float32)
+    for start, intersection in _blocks(packed):
+        stop = start + len(intersection)
+        active = (counts[start:stop] > 0)[:, None] & (counts > 0)[None, :]
+        similarity[start:stop] = np.where(active, _similarity(intersection, counts[start:stop], counts, n_bits, metric), 0.0)
+    return similarity
+
+
+def similar_pairs(packed, n_bits, threshold=0.7, metric='jaccard'):
+    """
+    Find all sensor pairs whose similarity is at least `threshold`.
+
+    Only the pairs above the threshold are kept, so memory stays bounded for
+    thousands of sensors. Sensors without any active hour are never paired.
+
+    Returns:
+    tuple: (i, j, similarity) arrays with i < j.
+    """
+    counts = popcount(packed)
+    found_i, found_j, found_similarity = [], [], []
+    for start, intersection in _blocks(packed):
+        stop = start + len(intersection)
+        similarity = _similarity(intersection, counts[start:stop], counts, n_bits, metric)
+        active = (counts[start:stop] > 0)[:, None] & (counts > 0)[None, :]
+        i, j = np.nonzero((similarity >= threshold) & active)
+        i += start
+        upper = i < j
+        found_i.append(i[upper])
+        found_j.append(j[upper])
+        found_similarity.append(similarity[i[upper] - start, j[upper]])
+
+    if not found_i:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_similarity)
+
+
+def cluster_sensors(sensors, i, j):
+    """
+    Group sensors connected by similar pairs (single linkage at the pair threshold).
+
+    Parameters:
+    sensors (list): Sensor names, in the order used for packing.
+    i (np.ndarray): First index of each similar pair.
+    j (np.ndarray): Second index of each similar pair.
+
+    Returns:
+    list: Clusters as lists of sensor names, largest first, singletons excluded.
+    """
+    parent = np.arange(len(sensors))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in zip(i, j):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    roots = np.array([find(x) for x in range(len(sensors))])
+    clusters = [[sensors[x] for x in np.flatnonzero(roots == root)] for root in np.unique(roots)]
+    clusters = [cluster for cluster in clusters if len(cluster) > 1]
+    return sorted(clusters, key=len, reverse=True)
+
+
+if __name__ == '__main__':
+    df = load_site(file_path, date_format='%d/%m/%Y %H:%M')
+
+    # Example usage:
+    sensors = ['3210 - Fiberlaser (kWh)', '3211 - Laser (kWh)', '3222 - Laser (kWh)',
+               '3223 - Laser (kWh)', '3226 - Laserstans (kWh)', '3212 - laser (kWh)',
+               '3250 - Press (kWh)', '3252 - press (kWh)', '3430 - P-stag (kWh)',
+               'Kompressor - S2PP (kWh)', 'Kompressor - S2QQ (kWh)', 'Kompressor - S2RR (kWh)']
+    readings = hourly_readings(df, sensors, start_date='2022-12-20', end_date='2024-04-22')
+    masks, thresholds = classify_states(readings)
+
+    names, packed, n_bits = pack_states(masks, states=('idle', 'production'))
+    i, j, similarity = similar_pairs(packed, n_bits, threshold=0.6)
+    for a, b, s in zip(i, j, similarity):
+        print(f"{names[a]} ~ {names[b]}: {s:.2f}")
+    for cluster in cluster_sensors(names, i, j):
+        print(f"Cluster: {', '.join(cluster)}")
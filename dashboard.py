@@ -0,0 +1,377 @@
+import json
+import math
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from operational_states import STATES, classify_states, hourly_readings, load_site, state_codes, state_intervals
+
+# File path to the CSV file in the Documents folder
+file_path = '/Users/armuaa/Documents/site-a.csv'  # Update to your correct path
+
+TILE_POINTS = 512  # Points kept per tile after downsampling
+MAX_WIDTH = 4000  # Upper bound on the requested screen width in pixels
+
+
+def lttb(x, y, n_out):
+    """
+    Downsample a series with Largest-Triangle-Three-Buckets.
+
+    Parameters:
+    x (np.ndarray): Sorted x values (float).
+    y (np.ndarray): y values, same length as x, without NaN.
+    n_out (int): Number of points to keep.
+
+    Returns:
+    tuple: (x, y) of the selected points.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    # Bucket edges over the inner points; the first and last points are always kept
+    every = (n - 2) / (n_out - 2)
+    edges = (np.arange(n_out - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return x[selected], y[selected]
+
+
+def reduce_intervals(starts, ends, codes, start, end, width):
+    """
+    Reduce state intervals to at most about one per pixel.
+
+    Intervals narrower than a pixel are replaced by one interval per pixel holding
+    the state with the longest total duration in it; adjacent intervals with the
+    same state are then merged.
+
+    Parameters:
+    starts (np.ndarray): Interval starts in epoch ms, sorted.
+    ends (np.ndarray): Interval ends in epoch ms.
+    codes (np.ndarray): State code of each interval (index into STATES).
+    start (float): Start of the view in epoch ms.
+    end (float): End of the view in epoch ms.
+    width (int): Width of the view in pixels.
+
+    Returns:
+    tuple: (starts, ends, codes) of the reduced intervals.
+    """
+    overlap = (ends > start) & (starts < end)
+    starts, ends, codes = starts[overlap], ends[overlap], codes[overlap]
+    if len(starts) == 0:
+        return starts, ends, codes
+
+    pixel = max(end - start, 1.0) / width
+    narrow = (ends - starts) < pixel
+
+    # Longest state per pixel among the narrow intervals
+    bins = np.clip(((starts[narrow] - start) // pixel).astype(np.int64), 0, width - 1)
+    durations = np.bincount(bins * len(STATES) + codes[narrow], weights=(ends - starts)[narrow],
+                            minlength=width * len(STATES)).reshape(width, len(STATES))
+    filled = np.flatnonzero(durations.sum(axis=1) > 0)
+    pixel_starts = (start + filled * pixel).astype(np.int64)
+
+    starts = np.concatenate([starts[~narrow], pixel_starts])
+    ends = np.concatenate([ends[~narrow], (start + (filled + 1) * pixel).astype(np.int64)])
+    codes = np.concatenate([codes[~narrow], durations[filled].argmax(axis=1)])
+
+    order = np.argsort(starts, kind='stable')
+    starts, ends, codes = starts[order], ends[order], codes[order]
+
+    # Merge runs of touching or overlapping intervals with the same state
+    joined = np.zeros(len(starts), dtype=bool)
+    joined[1:] = (codes[1:] == codes[:-1]) & (starts[1:] <= np.maximum.accumulate(ends)[:-1])
+    first = np.flatnonzero(~joined)
+    return starts[first], np.maximum.reduceat(ends, first), codes[first]
+
+
+class TileCache:
+    """
+    Downsampled tiles of each sensor series, keyed by (sensor, level, tile).
+
+    Level 0 covers the whole time range with one tile; every level doubles the
+    number of tiles, so a tile at any level holds at most TILE_POINTS points.
+    """
+
+    def __init__(self, readings, max_tiles=20000):
+        self.t0 = readings.index[0].value / 1e6
+        self.span = max(readings.index[-1].value / 1e6 - self.t0, 1.0)
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict()
+        self.lock = threading.Lock()
+        self.series = {}
+
+        times = readings.index.asi8 / 1e6
+        for sensor in readings.columns:
+            values = readings[sensor].to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            self.series[sensor] = (times[valid], values[valid])
+
+        # First level at which a tile holds no more than TILE_POINTS raw points, so no further detail exists
+        self.max_level = max(0, math.ceil(math.log2(max(len(readings), 1) / TILE_POINTS)))
+
+    def level_for(self, start, end, width):
+        """
+        Pick the coarsest level whose tiles have at least one point per pixel.
+        """
+        needed = width * self.span / (max(end - start, 1.0) * TILE_POINTS)
+        level = math.ceil(math.log2(needed)) if needed > 1 else 0
+        return min(max(level, 0), self.max_level)
+
+    def tile(self, sensor, level, index):
+        key = (sensor, level, index)
+        with self.lock:
+            if key in self.tiles:
+                self.tiles.move_to_end(key)
+                return self.tiles[key]
+
+        x, y = self.series[sensor]
+        tile_span = self.span / 2 ** level
+        lo = np.searchsorted(x, self.t0 + index * tile_span, side='left')
+        hi = np.searchsorted(x, self.t0 + (index + 1) * tile_span, side='left')
+        if index == 2 ** level - 1:
+            hi = len(x)
+        tile = lttb(x[lo:hi], y[lo:hi], TILE_POINTS)
+
+        with self.lock:
+            self.tiles[key] = tile
+            if len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+        return tile
+
+    def warm(self, levels=4):
+        """
+        Pre-compute the tiles of the coarsest levels for every sensor.
+        """
+        for sensor in self.series:
+            for level in range(min(levels, self.max_level + 1)):
+                for index in range(2 ** level):
+                    self.tile(sensor, level, index)
+
+    def query(self, sensor, start, end, width):
+        """
+        Return the downsampled points of a sensor between start and end (epoch ms).
+        """
+        level = self.level_for(start, end, width)
+        tile_span = self.span / 2 ** level
+        first = max(int((start - self.t0) // tile_span), 0)
+        last = min(int((end - self.t0) // tile_span), 2 ** level - 1)
+
+        parts = [self.tile(sensor, level, index) for index in range(first, last + 1)]
+        if not parts:
+            return np.empty(0), np.empty(0)
+        x = np.concatenate([part[0] for part in parts])
+        y = np.concatenate([part[1] for part in parts])
+
+        inside = (x >= start) & (x <= end)
+        return lttb(x[inside], y[inside], width)
+
+
+class Dashboard:
+    """
+    Hold the readings, tile cache and state intervals served by the dashboard.
+    """
+
+    def __init__(self, readings, base_load_percentile=10, tolerance=0.5, warm_levels=4):
+        self.readings = readings
+        self.cache = TileCache(readings)
+        self.cache.warm(warm_levels)
+
+        masks, self.thresholds = classify_states(readings, base_load_percentile, tolerance)
+        codes = state_codes(masks)
+        state_index = {state: code for code, state in enumerate(STATES)}
+        self.intervals = {}
+        for sensor in readings.columns:
+            intervals = state_intervals(codes[sensor])
+            self.intervals[sensor] = (
+                intervals['start'].to_numpy(dtype='datetime64[ms]').astype(np.int64),
+                intervals['end'].to_numpy(dtype='datetime64[ms]').astype(np.int64),
+                np.array([state_index[state] for state in intervals['state']], dtype=np.int64),
+            )
+
+    def sensors(self):
+        return {
+            'sensors': list(self.readings.columns),
+            'start': self.cache.t0,
+            'end': self.cache.t0 + self.cache.span,
+        }
+
+    def series(self, sensor, start, end, width):
+        x, y = self.cache.query(sensor, start, end, width)
+        return {'t': x.tolist(), 'v': y.tolist()}
+
+    def states(self, sensor, start, end, width):
+        starts, ends, codes = reduce_intervals(*self.intervals[sensor], start, end, width)
+        return {
+            'start': starts.tolist(),
+            'end': ends.tolist(),
+            'state': [STATES[code] for code in codes],
+        }
+
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Base Load Dashboard</title>
+<style>
+body { font-family: sans-serif; margin: 16px; }
+canvas { border: 1px solid #ccc; width: 100%; height: 480px; cursor: grab; }
+</style>
+</head>
+<body>
+<select id="sensor"></select>
+<span id="range"></span>
+<canvas id="plot"></canvas>
+<script>
+const COLORS = {missing: 'rgba(128,128,128,0.4)', no_consumption: 'rgba(255,0,0,0.3)',
+                base_load: 'rgba(128,0,128,0.12)',
+                idle: 'rgba(255,165,0,0.3)', production: 'rgba(0,128,0,0.3)'};
+const canvas = document.getElementById('plot');
+const select = document.getElementById('sensor');
+let extent = null, view = null, pending = null, drag = null;
+
+async function getJSON(url) { return (await fetch(url)).json(); }
+
+async function refresh() {
+  const width = canvas.clientWidth;
+  const q = `sensor=${encodeURIComponent(select.value)}&start=${view[0]}&end=${view[1]}&width=${width}`;
+  const [series, states] = await Promise.all([getJSON('/api/series?' + q), getJSON('/api/states?' + q)]);
+  draw(series, states);
+}
+
+function schedule() { clearTimeout(pending); pending = setTimeout(refresh, 50); }
+
+function draw(series, states) {
+  const w = canvas.width = canvas.clientWidth, h = canvas.height = canvas.clientHeight;
+  const ctx = canvas.getContext('2d');
+  const sx = t => (t - view[0]) / (view[1] - view[0]) * w;
+  const ymax = Math.max(1e-9, ...series.v);
+  const sy = v => h - 10 - v / ymax * (h - 20);
+  states.state.forEach((s, i) => {
+    ctx.fillStyle = COLORS[s];
+    ctx.fillRect(sx(states.start[i]), 0, Math.max(1, sx(states.end[i]) - sx(states.start[i])), h);
+  });
+  ctx.strokeStyle = '#1f77b4';
+  ctx.beginPath();
+  series.t.forEach((t, i) => i ? ctx.lineTo(sx(t), sy(series.v[i])) : ctx.moveTo(sx(t), sy(series.v[i])));
+  ctx.stroke();
+  document.getElementById('range').textContent =
+    new Date(view[0]).toISOString().slice(0, 16) + ' \\u2013 ' + new Date(view[1]).toISOString().slice(0, 16);
+}
+
+canvas.addEventListener('wheel', e => {
+  e.preventDefault();
+  const f = e.deltaY > 0 ? 1.25 : 0.8, r = e.offsetX / canvas.clientWidth;
+  const c = view[0] + r * (view[1] - view[0]), span = Math.max(3600e3 * 6, (view[1] - view[0]) * f);
+  view = [Math.max(extent[0], c - r * span), Math.min(extent[1], c + (1 - r) * span)];
+  schedule();
+});
+canvas.addEventListener('mousedown', e => { drag = [e.clientX, view.slice()]; });
+window.addEventListener('mouseup', () => { drag = null; });
+window.addEventListener('mousemove', e => {
+  if (!drag) return;
+  const span = drag[1][1] - drag[1][0];
+  let shift = -(e.clientX - drag[0]) / canvas.clientWidth * span;
+  shift = Math.min(Math.max(shift, extent[0] - drag[1][0]), extent[1] - drag[1][1]);
+  view = [drag[1][0] + shift, drag[1][1] + shift];
+  schedule();
+});
+select.addEventListener('change', schedule);
+
+getJSON('/api/sensors').then(info => {
+  info.sensors.forEach(s => select.add(new Option(s, s)));
+  extent = [info.start, info.end];
+  view = extent.slice();
+  refresh();
+});
+</script>
+</body>
+</html>
+"""
+
+
+def make_handler(dashboard):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+            try:
+                if url.path == '/':
+                    self.send(200, PAGE.encode('utf-8'), 'text/html; charset=utf-8')
+                elif url.path == '/api/sensors':
+                    self.send_json(dashboard.sensors())
+                elif url.path in ('/api/series', '/api/states'):
+                    sensor = params['sensor']
+                    if sensor not in dashboard.cache.series:
+                        self.send(404, b'Unknown sensor', 'text/plain')
+                        return
+                    start, end = float(params['start']), float(params['end'])
+                    if not (math.isfinite(start) and math.isfinite(end)):
+                        raise ValueError('start and end must be finite')
+                    width = min(max(int(params.get('width', 1000)), 3), MAX_WIDTH)
+                    if url.path == '/api/series':
+                        self.send_json(dashboard.series(sensor, start, end, width))
+                    else:
+                        self.send_json(dashboard.states(sensor, start, end, width))
+                else:
+                    self.send(404, b'Not found', 'text/plain')
+            except (KeyError, ValueError) as e:
+                self.send(400, f'Bad request: {e}'.encode('utf-8'), 'text/plain')
+
+        def send_json(self, payload):
+            self.send(200, json.dumps(payload).encode('utf-8'), 'application/json')
+
+        def send(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(dashboard, host='127.0.0.1', port=8050):
+    """
+    Serve the dashboard on a local address until interrupted.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(dashboard))
+    print(f"Dashboard running on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    df = load_site(file_path, date_format='%d/%m/%Y %H:%M')
+
+    # Example usage:
+    sensors = [column for column in df.columns if column.endswith('(kWh)')]
+    readings = hourly_readings(df, sensors, start_date='2022-12-20', end_date='2024-04-22')
+    serve(Dashboard(readings))
@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+STATES = ['missing', 'no_consumption', 'base_load', 'idle', 'production']
+
+HOURS_PER_WEEK = 7 * 24
+
+
+def load_site(file_path, date_format=None):
+    """
+    Load a site CSV and index it by 'Date (Europe/Stockholm)'.
+
+    Parameters:
+    file_path (str): Path to the site CSV file.
+    date_format (str): Optional format of the date column, e.g. '%d/%m/%Y %H:%M'.
+
+    Returns:
+    pd.DataFrame: The sensor data indexed by 'Date'.
+    """
+    df = pd.read_csv(file_path)
+    df['Date'] = pd.to_datetime(df['Date (Europe/Stockholm)'], format=date_format)
+    df.set_index('Date', inplace=True)
+    return df
+
+
+def hourly_readings(df, sensors, start_date=None, end_date=None):
+    """
+    Remove IQR outliers and resample several sensors to an hourly frequency.
+
+    The IQR bounds are computed per column, as `filter_outliers_iqr` does for a
+    single sensor, so gaps stay NaN after resampling.
+
+    Parameters:
+    df (pd.DataFrame): The input DataFrame indexed by 'Date'.
+    sensors (list): The sensor columns to include; missing columns are skipped.
+    start_date (str): Optional start of the date range.
+    end_date (str): Optional end of the date range.
+
+    Returns:
+    pd.DataFrame: Hourly readings, one column per sensor.
+    """
+    sensors = [sensor for sensor in sensors if sensor in df.columns]
+    data = df[sensors].apply(pd.to_numeric, errors='coerce')
+
+    q1 = data.quantile(0.25)
+    q3 = data.quantile(0.75)
+    iqr = q3 - q1
+    data = data.where((data >= q1 - 1.5 * iqr) & (data <= q3 + 1.5 * iqr))
+
+    readings = data.resample('h').mean()
+    return readings.loc[start_date:end_date]
+
+
+def classify_states(readings, base_load_percentile=10, tolerance=0.5):
+    """
+    Split hourly readings into operational states for all sensors at once.
+
+    Uses the same rules as `analyze_base_load` in Baseload-Example 2/3: the base load
+    level is a percentile of the positive readings, production starts one third of
+    the way from the base load level to the maximum, and zero or negative readings
+    count as no energy consumption.
+
+    Parameters:
+    readings (pd.DataFrame): Hourly readings, one column per sensor.
+    base_load_percentile (float): Percentile used for the base load level.
+    tolerance (float): Tolerance above the base load level still counted as base load.
+
+    Returns:
+    tuple: (masks, thresholds) where masks maps each name in STATES to a boolean
+        DataFrame shaped like `readings`, and thresholds is a DataFrame indexed by
+        sensor with 'percentile_base_load' and 'production_threshold' columns.
+    """
+    missing = readings.isna()
+    no_consumption = readings <= 0
+
+    valid = readings.where(~missing & ~no_consumption)
+    percentile_base_load = valid.quantile(base_load_percentile / 100)
+    production_threshold = percentile_base_load + (readings.max() - percentile_base_load) / 3
+
+    active = ~missing & ~no_consumption
+    base_load = active & readings.le(percentile_base_load + tolerance, axis=1)
+    production = active & readings.gt(production_threshold, axis=1)
+    idle = active & ~base_load & ~production
+
+    masks = {
+        'missing': missing,
+        'no_consumption': no_consumption,
+        'base_load': base_load,
+        'idle': idle,
+        'production': production,
+    }
+    thresholds = pd.DataFrame({
+        'percentile_base_load': percentile_base_load,
+        'production_threshold': production_threshold,
+    })
+    return masks, thresholds
+
+
+def state_codes(masks):
+    """
+    Collapse state masks into one integer code per reading (index into STATES).
+
+    Parameters:
+    masks (dict): State masks as returned by `classify_states`.
+
+    Returns:
+    pd.DataFrame: int8 codes shaped like the masks.
+    """
+    reference = masks['missing']
+    codes = np.zeros(reference.shape, dtype=np.int8)
+    for code, state in enumerate(STATES):
+        if code:
+            codes[masks[state].to_numpy()] = code
+    return pd.DataFrame(codes, index=reference.index, columns=reference.columns)
+
+
+def state_intervals(codes, freq='h'):
+    """
+    Run-length encode a series of state codes into intervals.
+
+    Parameters:
+    codes (pd.Series): State codes on a regular time index.
+    freq (str): The sampling frequency, used to close the last reading of a run.
+
+    Returns:
+    pd.DataFrame: Columns 'start', 'end' and 'state', one row per run.
+    """
+    values = codes.to_numpy()
+    if len(values) == 0:
+        return pd.DataFrame(columns=['start', 'end', 'state'])
+
+    boundaries = np.flatnonzero(np.diff(values)) + 1
+    starts = np.r_[0, boundaries]
+    ends = np.r_[boundaries, len(values)]
+
+    return pd.DataFrame({
+        'start': codes.index[starts],
+        'end': codes.index[ends - 1] + pd.tseries.frequencies.to_offset(freq),
+        'state': np.array(STATES, dtype=object)[values[starts]],
+    })
+
+
+def shift_mask(shift_start=6, shift_end=18, workdays=(0, 1, 2, 3, 4)):
+    """
+    Build a boolean mask over the 168 weekday-hour slots marking production shifts.
+
+    Parameters:
+    shift_start (int): First hour of the shift.
+    shift_end (int): Hour at which the shift ends (exclusive).
+    workdays (tuple): Weekdays (Monday=0) with a production shift.
+
+    Returns:
+    np.ndarray: Boolean array of length 168, True for on-shift slots.
+    """
+    weekdays = np.arange(HOURS_PER_WEEK) // 24
+    hours = np.arange(HOURS_PER_WEEK) % 24
+    return np.isin(weekdays, workdays) & (hours >= shift_start) & (hours < shift_end)
@@ -0,0 +1,257 @@
+import json
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from operational_states import classify_states, hourly_readings, load_site, shift_mask
+
+# File path to the CSV file in the Documents folder
+file_path = '/Users/armuaa/Documents/site-a.csv'  # Update to your correct path
+
+# Levels are averaged across periods, hours and kWh are summed
+LEVEL_KPIS = ['percentile_base_load', 'avg_base_load', 'avg_idle', 'avg_production']
+ADDITIVE_KPIS = [
+    'base_load_hours', 'idle_hours', 'production_hours', 'no_consumption_hours', 'missing_hours',
+    'base_load_kwh', 'off_hours_base_load_kwh', 'off_hours_idle_kwh',
+]
+KPI_COLUMNS = LEVEL_KPIS + ADDITIVE_KPIS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    start_date TEXT,
+    end_date TEXT,
+    parameters TEXT
+);
+CREATE TABLE IF NOT EXISTS sensor_kpis (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    site TEXT NOT NULL,
+    sensor TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    {kpi_columns}
+);
+CREATE TABLE IF NOT EXISTS sensor_thresholds (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    site TEXT NOT NULL,
+    sensor TEXT NOT NULL,
+    percentile_base_load REAL,
+    production_threshold REAL
+);
+CREATE INDEX IF NOT EXISTS idx_kpis_sensor_period ON sensor_kpis (sensor, period_start);
+CREATE INDEX IF NOT EXISTS idx_kpis_site_period ON sensor_kpis (site, period_start);
+CREATE INDEX IF NOT EXISTS idx_kpis_run ON sensor_kpis (run_id);
+CREATE INDEX IF NOT EXISTS idx_kpis_latest ON sensor_kpis (site, sensor, period_start, run_id);
+CREATE INDEX IF NOT EXISTS idx_thresholds_sensor_run ON sensor_thresholds (sensor, run_id);
+CREATE INDEX IF NOT EXISTS idx_runs_site ON runs (site, created_at);
+""".format(kpi_columns=',\n    '.join(f'{column} REAL' for column in KPI_COLUMNS))
+
+
+def compute_kpis(readings, masks, on_shift=None, period='MS', base_load_percentile=10):
+    """
+    Compute the base load KPIs of every sensor per period.
+
+    These are the averages `analyze_base_load` prints, plus state durations and
+    the base load and idle energy used outside production shifts. The percentile
+    base load is taken over each period's own positive readings, so it can trend.
+
+    Parameters:
+    readings (pd.DataFrame): Hourly readings, one column per sensor.
+    masks (dict): State masks as returned by `classify_states`.
+    on_shift (np.ndarray): Boolean mask over the 168 weekday-hour slots, see `shift_mask`.
+    period (str): Pandas frequency of the reporting periods, e.g. 'MS' for months.
+    base_load_percentile (float): Percentile used for the base load level.
+
+    Returns:
+    pd.DataFrame: One row per (period_start, sensor) with the columns in KPI_COLUMNS.
+    """
+    on_shift = shift_mask() if on_shift is None else np.asarray(on_shift, dtype=bool)
+    slots = (readings.index.weekday * 24 + readings.index.hour).to_numpy()
+    off_hours = pd.Series(~on_shift[slots], index=readings.index)
+
+    grouper = pd.Grouper(freq=period)
+    base_load, idle = masks['base_load'], masks['idle']
+
+    kpis = {
+        'percentile_base_load': readings.where(readings > 0).groupby(grouper).quantile(base_load_percentile / 100),
+        'avg_base_load': readings.where(base_load).groupby(grouper).mean(),
+        'avg_idle': readings.where(idle).groupby(grouper).mean(),
+        'avg_production': readings.where(masks['production']).groupby(grouper).mean(),
+        'base_load_hours': base_load.groupby(grouper).sum(),
+        'idle_hours': idle.groupby(grouper).sum(),
+        'production_hours': masks['production'].groupby(grouper).sum(),
+        'no_consumption_hours': masks['no_consumption'].groupby(grouper).sum(),
+        'missing_hours': masks['missing'].groupby(grouper).sum(),
+        'base_load_kwh': readings.where(base_load).groupby(grouper).sum(),
+        'off_hours_base_load_kwh': readings.where(base_load.mul(off_hours, axis=0).astype(bool)).groupby(grouper).sum(),
+        'off_hours_idle_kwh': readings.where(idle.mul(off_hours, axis=0).astype(bool)).groupby(grouper).sum(),
+    }
+
+    # Every frame shares the same period index and sensor columns, so flatten them row-major
+    first = kpis['avg_base_load']
+    kpis['percentile_base_load'] = kpis['percentile_base_load'].reindex(index=first.index, columns=first.columns)
+    index = pd.MultiIndex.from_product([first.index, first.columns], names=['period_start', 'sensor'])
+    result = pd.DataFrame({name: frame.to_numpy(dtype=float).ravel() for name, frame in kpis.items()}, index=index)
+    result = result.reset_index()
+    return result[['period_start', 'sensor'] + KPI_COLUMNS]
+
+
+class ResultsStore:
+    """
+    Embedded SQLite store of base load KPIs from every analysis run.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def write_site(self, site, kpis, thresholds=None, parameters=None, start_date=None, end_date=None):
+        """
+        Store the KPIs of one site in a single transaction.
+
+        Parameters:
+        site (str): Site name.
+        kpis (pd.DataFrame): KPIs as returned by `compute_kpis`.
+        thresholds (pd.DataFrame): Thresholds of the run as returned by `classify_states`.
+        parameters (dict): Analysis parameters to keep with the run.
+        start_date (str): Start of the analysed date range.
+        end_date (str): End of the analysed date range.
+
+        Returns:
+        int: The id of the new run.
+        """
+        values = kpis[KPI_COLUMNS].astype(float)
+        values = values.astype(object).where(values.notna(), None)
+        period_starts = pd.to_datetime(kpis['period_start']).dt.strftime('%Y-%m-%d %H:%M:%S')
+        rows = zip(kpis['sensor'], period_starts, values.itertuples(index=False, name=None))
+
+        placeholders = ', '.join(['?'] * (len(KPI_COLUMNS) + 4))
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO runs (site, created_at, start_date, end_date, parameters) VALUES (?, ?, ?, ?, ?)',
+                (site, datetime.now().isoformat(timespec='seconds'), start_date, end_date,
+                 json.dumps(parameters or {})),
+            )
+            run_id = cursor.lastrowid
+            self.connection.executemany(
+                f'INSERT INTO sensor_kpis (run_id, site, sensor, period_start, {", ".join(KPI_COLUMNS)}) '
+                f'VALUES ({placeholders})',
+                ((run_id, site, sensor, period_start) + kpi for sensor, period_start, kpi in rows),
+            )
+            if thresholds is not None:
+                levels = thresholds[['percentile_base_load', 'production_threshold']].astype(float)
+                levels = levels.astype(object).where(levels.notna(), None)
+                self.connection.executemany(
+                    'INSERT INTO sensor_thresholds VALUES (?, ?, ?, ?, ?)',
+                    ((run_id, site, sensor) + tuple(level) for sensor, level in
+                     zip(levels.index, levels.itertuples(index=False, name=None))),
+                )
+        return run_id
+
+    def _latest(self, where, params):
+        # KPIs of the most recent run that covers each (site, sensor, period)
+        return (
+            'SELECT k.* FROM sensor_kpis k '
+            'WHERE k.run_id = (SELECT MAX(l.run_id) FROM sensor_kpis l '
+            'WHERE l.site = k.site AND l.sensor = k.sensor AND l.period_start = k.period_start) '
+            f'AND {where}'
+        ), params
+
+    def base_load_trend(self, sensor, months=12, site=None, until=None):
+        """
+        Base load KPIs of a sensor per period over the last `months` months.
+
+        Parameters:
+        sensor (str): Sensor name.
+        months (int): Number of months to include, counting the month of `until`.
+        site (str): Optional site name.
+        until (str): Last period to include; defaults to the latest stored period of the sensor.
+
+        Returns:
+        pd.DataFrame: One row per period, oldest first.
+        """
+        site_filter, site_params = ('', []) if site is None else (' AND site = ?', [site])
+        if until is None:
+            until = self.connection.execute(
+                f'SELECT MAX(period_start) FROM sensor_kpis WHERE sensor = ?{site_filter}',
+                [sensor] + site_params,
+            ).fetchone()[0]
+        until = pd.Timestamp(until) if until is not None else pd.Timestamp.now()
+
+        since = (until.to_period('M').to_timestamp() - pd.DateOffset(months=months - 1)).strftime('%Y-%m-%d')
+        where = 'k.sensor = ? AND k.period_start >= ? AND k.period_start <= ?'
+        params = [sensor, since, until.strftime('%Y-%m-%d %H:%M:%S')]
+        if site is not None:
+            where += ' AND k.site = ?'
+            params.append(site)
+        query, params = self._latest(where, params)
+        query = (
+            'SELECT site, period_start, percentile_base_load, avg_base_load, base_load_hours, '
+            f'base_load_kwh, off_hours_base_load_kwh FROM ({query}) ORDER BY site, period_start'
+        )
+        return pd.read_sql_query(query, self.connection, params=params)
+
+    def top_sensors(self, metric='off_hours_base_load_kwh', limit=10, since=None, site=None):
+        """
+        Rank sensors by a KPI over all periods since a date; hours and kWh are
+        summed, levels are averaged.
+
+        Returns:
+        pd.DataFrame: Columns 'site', 'sensor' and the metric, highest first.
+        """
+        if metric not in KPI_COLUMNS:
+            raise ValueError(f"Unknown metric {metric!r}, expected one of {KPI_COLUMNS}")
+        aggregate = 'SUM' if metric in ADDITIVE_KPIS else 'AVG'
+        where, params = '1 = 1', []
+        if since is not None:
+            where += ' AND k.period_start >= ?'
+            params.append(pd.Timestamp(since).strftime('%Y-%m-%d'))
+        if site is not None:
+            where += ' AND k.site = ?'
+            params.append(site)
+        query, params = self._latest(where, params)
+        query = (
+            f'SELECT site, sensor, {aggregate}({metric}) AS {metric} FROM ({query}) '
+            f'GROUP BY site, sensor ORDER BY {metric} DESC LIMIT ?'
+        )
+        return pd.read_sql_query(query, self.connection, params=params + [limit])
+
+    def close(self):
+        self.connection.close()
+
+
+def record_site(store, site, df, sensors, start_date=None, end_date=None,
+                base_load_percentile=10, tolerance=0.5, period='MS'):
+    """
+    Run the base load analysis for all sensors of a site and store the KPIs.
+
+    Returns:
+    int: The id of the new run.
+    """
+    readings = hourly_readings(df, sensors, start_date, end_date)
+    masks, thresholds = classify_states(readings, base_load_percentile, tolerance)
+    kpis = compute_kpis(readings, masks, period=period, base_load_percentile=base_load_percentile)
+    parameters = {
+        'base_load_percentile': base_load_percentile,
+        'tolerance': tolerance,
+        'period': period,
+    }
+    return store.write_site(site, kpis, thresholds, parameters, start_date, end_date)
+
+
+if __name__ == '__main__':
+    df = load_site(file_path, date_format='%d/%m/%Y %H:%M')
+
+    # Example usage:
+    sensors = [column for column in df.columns if column.endswith('(kWh)')]
+    store = ResultsStore('results.sqlite')
+    record_site(store, 'site-a', df, sensors, start_date='2022-12-20', end_date='2024-04-22')
+    print(store.base_load_trend('3210 - Fiberlaser (kWh)'))
+    print(store.top_sensors(limit=10))
+    store.close()
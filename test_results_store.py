@@ -0,0 +1,76 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pd = pytest.importorskip('pandas')
+
+from operational_states import classify_states
+from results_store import ResultsStore, compute_kpis
+
+
+def make_readings():
+    index = pd.date_range('2023-01-01', '2023-06-30 23:00', freq='h')
+    rng = np.random.default_rng(0)
+    readings = pd.DataFrame({
+        'S0 (kWh)': 2 + rng.random(len(index)) + 10 * (index.hour >= 8) * (index.hour < 16),
+        'S1 (kWh)': 1 + rng.random(len(index)),
+    }, index=index)
+    # Raise the base load of S0 month by month so the trend is visible
+    readings['S0 (kWh)'] += index.month - 1
+    return readings
+
+
+def test_write_site_round_trip(tmp_path):
+    readings = make_readings()
+    masks, thresholds = classify_states(readings)
+    kpis = compute_kpis(readings, masks)
+
+    store = ResultsStore(str(tmp_path / 'results.sqlite'))
+    store.write_site('site-a', kpis, thresholds)
+
+    trend = store.base_load_trend('S0 (kWh)', months=12)
+    assert list(trend['site']) == ['site-a'] * 6
+    assert list(trend['period_start']) == [f'2023-0{month}-01 00:00:00' for month in range(1, 7)]
+    assert trend['percentile_base_load'].is_monotonic_increasing
+    assert trend['percentile_base_load'].nunique() == 6
+
+    assert len(store.base_load_trend('S0 (kWh)', months=3)) == 3
+
+    top = store.top_sensors(limit=10)
+    assert set(top['sensor']) == {'S0 (kWh)', 'S1 (kWh)'}
+
+    stored = store.connection.execute('SELECT COUNT(*) FROM sensor_thresholds').fetchone()[0]
+    assert stored == 2
+    store.close()
+
+
+def test_latest_run_wins_for_overlapping_periods(tmp_path):
+    readings = make_readings()
+    masks, thresholds = classify_states(readings)
+    kpis = compute_kpis(readings, masks)
+
+    store = ResultsStore(str(tmp_path / 'results.sqlite'))
+    store.write_site('site-a', kpis, thresholds)
+
+    # A later run covering April to June only, with S1 now wasting far more energy
+    rerun = kpis[kpis['period_start'] >= '2023-04-01'].copy()
+    rerun.loc[rerun['sensor'] == 'S1 (kWh)', 'off_hours_base_load_kwh'] += 10000
+    store.write_site('site-a', rerun, thresholds)
+
+    top = store.top_sensors(limit=10)
+    assert list(top['sensor']) == ['S1 (kWh)', 'S0 (kWh)']
+
+    first_run = kpis[kpis['period_start'] < '2023-04-01']
+    expected = (first_run.loc[first_run['sensor'] == 'S1 (kWh)', 'off_hours_base_load_kwh'].sum()
+                + rerun.loc[rerun['sensor'] == 'S1 (kWh)', 'off_hours_base_load_kwh'].sum())
+    assert top.loc[top['sensor'] == 'S1 (kWh)', 'off_hours_base_load_kwh'].item() == pytest.approx(expected)
+
+    trend = store.base_load_trend('S1 (kWh)', months=12)
+    assert len(trend) == 6
+    store.close()
+
+
+def test_top_sensors_rejects_unknown_metric(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.sqlite'))
+    with pytest.raises(ValueError):
+        store.top_sensors(metric='run_id')
+    store.close()
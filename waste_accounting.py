@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+from operational_states import HOURS_PER_WEEK, classify_states, hourly_readings, load_site, shift_mask
+
+# File paths to the site CSV files in the Documents folder
+site_files = {
+    'site-a': '/Users/armuaa/Documents/site-a.csv',  # Update to your correct paths
+}
+
+WASTE_STATES = ('base_load', 'idle')
+
+# Example time-of-use tariffs per kWh; later entries override earlier ones
+tariffs = {
+    'flat': [(range(7), 0, 24, 1.20)],
+    'time_of_use': [
+        (range(7), 0, 24, 0.80),
+        ((0, 1, 2, 3, 4), 6, 22, 1.60),
+    ],
+}
+
+
+def tariff_matrix(tariffs):
+    """
+    Build a price per weekday-hour slot for every tariff scenario.
+
+    Parameters:
+    tariffs (dict): Scenario name -> list of (weekdays, start_hour, end_hour, price)
+        entries; later entries override earlier ones for the slots they cover.
+
+    Returns:
+    tuple: (names, prices) where prices has shape (n_scenarios, 168).
+    """
+    names = list(tariffs)
+    prices = np.full((len(names), HOURS_PER_WEEK), np.nan)
+    weekdays = np.arange(HOURS_PER_WEEK) // 24
+    hours = np.arange(HOURS_PER_WEEK) % 24
+
+    for row, name in enumerate(names):
+        for days, start_hour, end_hour, price in tariffs[name]:
+            prices[row, np.isin(weekdays, list(days)) & (hours >= start_hour) & (hours < end_hour)] = price
+
+    if np.isnan(prices).any():
+        missing = [name for name, row in zip(names, prices) if np.isnan(row).any()]
+        raise ValueError(f"Tariffs do not cover every weekday and hour: {missing}")
+    return names, prices
+
+
+def fleet_readings(site_readings):
+    """
+    Combine the hourly readings of several sites into one frame.
+
+    Parameters:
+    site_readings (dict): Site name -> hourly readings as returned by `hourly_readings`.
+
+    Returns:
+    pd.DataFrame: Readings on the union of all hours with ('site', 'sensor') columns.
+    """
+    return pd.concat(site_readings, axis=1, names=['site', 'sensor'])
+
+
+def account_waste(readings, masks, tariffs, on_shift=None, holidays=(), states=WASTE_STATES, period='M'):
+    """
+    Compute energy and cost spent in base load and idle outside production shifts.
+
+    Only off-hours rows are used. For each waste state, the wasted kWh form an
+    (hour, sensor) matrix, which is multiplied by a (period, hour) membership matrix
+    for the energy and by a (scenario x period, hour) matrix of hourly prices for the
+    cost, so all sensors, periods and scenarios come out of two matrix products and
+    at most one (hour, sensor) float array is held at a time.
+
+    Parameters:
+    readings (pd.DataFrame): Hourly readings, one column per sensor (or per site and sensor).
+    masks (dict): State masks as returned by `classify_states`.
+    tariffs (dict): Tariff scenarios, see `tariff_matrix`.
+    on_shift (np.ndarray): Boolean mask over the 168 weekday-hour slots, see `shift_mask`.
+    holidays (list): Dates without production; they are treated as Sundays for
+        both the shift calendar and the tariffs.
+    states (tuple): The states counted as waste.
+    period (str): Pandas period alias of the reporting periods, e.g. 'M' for months.
+
+    Returns:
+    pd.DataFrame: One row per scenario, period, state and sensor with 'kwh' and 'cost'.
+    """
+    on_shift = shift_mask() if on_shift is None else np.asarray(on_shift, dtype=bool)
+    names, prices = tariff_matrix(tariffs)
+
+    index = readings.index
+    holiday = index.normalize().isin(pd.to_datetime(list(holidays)))
+    weekday = np.where(holiday, 6, index.weekday)
+    slots = weekday * 24 + index.hour.to_numpy()
+    off_hours = ~on_shift[slots]
+
+    # Periods are labelled over all hours so periods without off-hours still appear
+    codes, periods = pd.factorize(index.to_period(period), sort=True)
+
+    # Keep only the off-hours rows
+    values = np.nan_to_num(readings.to_numpy(dtype=float)[off_hours])
+    codes, slots = codes[off_hours], slots[off_hours]
+    n_hours, n_sensors = values.shape
+    n_states = len(states)
+
+    # One-hot period membership of every off-hours row, and the same weighted by price
+    membership = np.zeros((len(periods), n_hours))
+    membership[codes, np.arange(n_hours)] = 1.0
+    weighted = (prices[:, slots][:, None, :] * membership[None, :, :]).reshape(len(names) * len(periods), n_hours)
+
+    kwh = np.empty((len(periods), n_states, n_sensors))
+    cost = np.empty((len(names) * len(periods), n_states, n_sensors))
+    for k, state in enumerate(states):
+        waste = np.where(masks[state].to_numpy(dtype=bool)[off_hours], values, 0.0)
+        kwh[:, k] = membership @ waste
+        cost[:, k] = weighted @ waste
+
+    n_rows = len(periods) * n_states * n_sensors
+    sensor_labels = readings.columns.to_frame(index=False)
+    if sensor_labels.shape[1] == 1:
+        sensor_labels.columns = ['sensor']
+    sensor_position = np.tile(np.arange(n_sensors), len(names) * len(periods) * n_states)
+
+    result = pd.DataFrame({
+        'scenario': np.repeat(names, n_rows),
+        'period_start': np.tile(np.repeat(periods.to_timestamp(), n_states * n_sensors), len(names)),
+        'state': np.tile(np.repeat(list(states), n_sensors), len(names) * len(periods)),
+    })
+    result = pd.concat([result, sensor_labels.iloc[sensor_position].reset_index(drop=True)], axis=1)
+    result['kwh'] = np.tile(kwh.ravel(), len(names))
+    result['cost'] = cost.ravel()
+    return result
+
+
+if __name__ == '__main__':
+    # Example usage:
+    site_readings = {}
+    for site, path in site_files.items():
+        df = load_site(path, date_format='%d/%m/%Y %H:%M')
+        sensors = [column for column in df.columns if column.endswith('(kWh)')]
+        site_readings[site] = hourly_readings(df, sensors, start_date='2022-12-20', end_date='2024-04-22')
+
+    readings = fleet_readings(site_readings)
+    masks, thresholds = classify_states(readings)
+    holidays = ['2022-12-24', '2022-12-25', '2022-12-26', '2022-12-31', '2023-01-01', '2023-01-06']
+    waste = account_waste(readings, masks, tariffs, holidays=holidays)
+
+    summary = waste.groupby(['scenario', 'site', 'sensor'])[['kwh', 'cost']].sum()
+    print(summary.sort_values('cost', ascending=False).head(20))